@@ -0,0 +1,278 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Set, Tuple
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted to the chat pipeline."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionTicket:
+    """A request holding (or waiting for) a pipeline slot.
+
+    Set ``skip_sample`` for quick exits (e.g. validation errors) so they do not
+    drag down the service-time estimate; runs that overshoot it still count.
+    """
+
+    def __init__(self, client: str, session: str):
+        self.client = client
+        self.session = session
+        self.started: Optional[float] = None
+        self.skip_sample = False
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.client, self.session)
+
+
+class AdmissionController:
+    """Global concurrency limit with a bounded, per-session fair wait queue.
+
+    Waiting requests are grouped by (client, session) and served round-robin,
+    so one session firing many parallel questions cannot starve the others,
+    even when many students share one network address. Each session is capped
+    on in-flight requests; ``max_per_client`` optionally adds a looser cap per
+    client address against session-id churn and is off by default.
+
+    A request is only queued if its estimated wait fits within ``max_wait``.
+    With every slot freshly started that estimate is roughly
+    ``service_time * (1 + ahead / max_concurrent)``, so the queue can only
+    fill up to ``max_queue`` when
+    ``max_wait >= service_time * (1 + max_queue / max_concurrent)``.
+    Size the three together; the defaults satisfy this for a 20s pipeline.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        max_queue: int = 8,
+        max_wait: float = 60.0,
+        max_per_client: Optional[int] = None,
+        max_per_session: int = 2,
+        initial_service_time: float = 20.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_per_client = max_per_client
+        self.max_per_session = max_per_session
+
+        self._running: Set[AdmissionTicket] = set()
+        self._queues: "OrderedDict[Tuple[str, str], Deque[Tuple[AdmissionTicket, asyncio.Future]]]" = OrderedDict()
+        self._per_client: Dict[str, int] = {}
+        self._per_session: Dict[Tuple[str, str], int] = {}
+        self._service_time = initial_service_time
+
+        self._admitted = 0
+        self._rejected = {
+            "client_limit": 0, "session_limit": 0, "queue_full": 0, "deadline": 0, "timeout": 0,
+        }
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=200)
+
+    # ---------- Queue bookkeeping ----------
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _has_free_slot(self) -> bool:
+        return len(self._running) < self.max_concurrent and not self._queues
+
+    def _ahead_of(self, key: Tuple[str, str]) -> int:
+        """Waiters served before a new request from this session under round-robin."""
+        own = len(self._queues.get(key, ()))
+        others = sum(
+            min(len(q), own + 1) for k, q in self._queues.items() if k != key
+        )
+        return own + others
+
+    def _estimated_wait(self, key: Tuple[str, str]) -> float:
+        """Time until the next slot frees, plus the rounds needed to clear those ahead."""
+        if self._has_free_slot():
+            return 0.0
+        now = time.monotonic()
+        next_free = min(
+            (max(0.0, t.started + self._service_time - now) for t in self._running),
+            default=0.0,
+        )
+        return next_free + self._ahead_of(key) / self.max_concurrent * self._service_time
+
+    def _grant(self, ticket: AdmissionTicket):
+        ticket.started = time.monotonic()
+        self._running.add(ticket)
+
+    def _dispatch(self):
+        """Hand free slots to waiters, one session at a time."""
+        while len(self._running) < self.max_concurrent and self._queues:
+            key, queue = next(iter(self._queues.items()))
+            ticket, waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if waiter.done():
+                continue
+            self._grant(ticket)
+            waiter.set_result(None)
+
+    def _dequeue(self, ticket: AdmissionTicket, waiter: asyncio.Future):
+        queue = self._queues.get(ticket.key)
+        if queue and (ticket, waiter) in queue:
+            queue.remove((ticket, waiter))
+            if not queue:
+                del self._queues[ticket.key]
+
+    def _hold(self, ticket: AdmissionTicket):
+        self._per_client[ticket.client] = self._per_client.get(ticket.client, 0) + 1
+        self._per_session[ticket.key] = self._per_session.get(ticket.key, 0) + 1
+
+    def _forget(self, ticket: AdmissionTicket):
+        for counts, key in (
+            (self._per_client, ticket.client),
+            (self._per_session, ticket.key),
+        ):
+            remaining = counts.get(key, 0) - 1
+            if remaining > 0:
+                counts[key] = remaining
+            else:
+                counts.pop(key, None)
+
+    def _abandon(self, ticket: AdmissionTicket, waiter: asyncio.Future):
+        self._dequeue(ticket, waiter)
+        waiter.cancel()
+        self._forget(ticket)
+
+    def _reject(self, reason: str, status_code: int, detail: str, retry_after: float):
+        self._rejected[reason] += 1
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    # ---------- Public API ----------
+    async def acquire(self, client: str, session: str) -> AdmissionTicket:
+        """Wait for a pipeline slot and return the ticket holding it."""
+        if self.max_per_client and self._per_client.get(client, 0) >= self.max_per_client:
+            self._reject(
+                "client_limit", 429,
+                "Too many requests in progress, please wait for earlier answers",
+                self._service_time,
+            )
+        if self._per_session.get((client, session), 0) >= self.max_per_session:
+            self._reject(
+                "session_limit", 429,
+                "Too many requests in progress for this session",
+                self._service_time,
+            )
+
+        ticket = AdmissionTicket(client, session)
+        key = ticket.key
+
+        if self._has_free_slot():
+            self._grant(ticket)
+            self._hold(ticket)
+            self._record_wait(0.0)
+            return ticket
+
+        if self._queued() >= self.max_queue:
+            self._reject(
+                "queue_full", 503,
+                "Server is busy, please try again shortly",
+                self._estimated_wait(key),
+            )
+
+        estimate = self._estimated_wait(key)
+        if estimate > self.max_wait:
+            self._reject(
+                "deadline", 503,
+                "Server is busy, please try again shortly",
+                estimate,
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append((ticket, waiter))
+        self._hold(ticket)
+        queued_at = time.monotonic()
+
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # Client went away; give back the slot if it was already granted
+            if waiter.done() and not waiter.cancelled():
+                ticket.skip_sample = True
+                self.release(ticket)
+            else:
+                self._abandon(ticket, waiter)
+            raise
+
+        if not waiter.done():
+            self._abandon(ticket, waiter)
+            self._reject(
+                "timeout", 503,
+                "Server is busy, please try again shortly",
+                self._estimated_wait(key),
+            )
+
+        self._record_wait(time.monotonic() - queued_at)
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        """Free a slot and admit the next waiter."""
+        elapsed = time.monotonic() - ticket.started
+        if not ticket.skip_sample or elapsed > self._service_time:
+            # Exponentially weighted average keeps estimates tracking current load
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+        self._running.discard(ticket)
+        self._forget(ticket)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: str, session: str):
+        """Hold a pipeline slot for the duration of the block."""
+        ticket = await self.acquire(client, session)
+        try:
+            yield ticket
+        except asyncio.CancelledError:
+            # Abandoned runs say nothing about how long the pipeline takes
+            ticket.skip_sample = True
+            raise
+        finally:
+            self.release(ticket)
+
+    def in_flight(self, client: str, session: Optional[str] = None) -> int:
+        """Requests running or queued for a client, or for one of its sessions."""
+        if session is None:
+            return self._per_client.get(client, 0)
+        return self._per_session.get((client, session), 0)
+
+    # ---------- Statistics ----------
+    def _record_wait(self, waited: float):
+        self._admitted += 1
+        self._total_wait += waited
+        self._max_wait_seen = max(self._max_wait_seen, waited)
+        self._recent_waits.append(waited)
+
+    def stats(self) -> dict:
+        recent = sorted(self._recent_waits)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "active": len(self._running),
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self._queued(),
+            "max_queue": self.max_queue,
+            "waiting_sessions": len(self._queues),
+            "clients_in_flight": len(self._per_client),
+            "sessions_in_flight": len(self._per_session),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "avg_wait_seconds": round(self._total_wait / self._admitted, 3) if self._admitted else 0.0,
+            "p95_wait_seconds": round(p95, 3),
+            "max_wait_seconds": round(self._max_wait_seen, 3),
+            "est_service_seconds": round(self._service_time, 3),
+        }
@@ -1,5 +1,7 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from openai import OpenAI
 import os
@@ -7,12 +9,14 @@ from dotenv import load_dotenv
 from typing import Optional, List, Dict
 import json
 import uuid
+import secrets
 from pathlib import Path
 import boto3
 from pypdf import PdfReader
 import io
 from anthropic import Anthropic
 from guardrails import check_forbidden, check_pii
+from admission import AdmissionController, AdmissionRejected
 from botocore.exceptions import ClientError
 
 
@@ -31,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # Initialize clients
@@ -38,6 +43,36 @@ app.add_middleware(
 client = OpenAI(api_key=os.getenv("google_api_key"), base_url="https://generativelanguage.googleapis.com/v1beta/openai/")
 claude = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
+# Admission control for the chat pipeline
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "8")),
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "60")),
+    # Optional abuse cap per client address; 0 disables it so shared campus IPs are not throttled
+    max_per_client=int(os.getenv("ADMISSION_MAX_PER_CLIENT", "0")) or None,
+    max_per_session=int(os.getenv("ADMISSION_MAX_PER_SESSION", "2")),
+)
+
+# Number of reverse proxies in front of the app that append to X-Forwarded-For
+# (Render's load balancer is one). Entries left of those are client-supplied.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+ADMISSION_STATS_TOKEN = os.getenv("ADMISSION_STATS_TOKEN")
+
+def client_ip(http_request: Request) -> str:
+    """Client address as seen by the outermost trusted proxy"""
+    forwarded = [ip.strip() for ip in http_request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    if TRUSTED_PROXY_HOPS and len(forwarded) >= TRUSTED_PROXY_HOPS:
+        return forwarded[-TRUSTED_PROXY_HOPS]
+    return http_request.client.host if http_request.client else "unknown"
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Memory directory
 # MEMORY_DIR = Path("../memory")
 # MEMORY_DIR.mkdir(exist_ok=True)
@@ -367,13 +402,37 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/admission/stats")
+async def admission_stats(http_request: Request):
+    # Disabled unless a token is configured; live load figures are not public
+    token = http_request.headers.get("x-admin-token", "")
+    if not ADMISSION_STATS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(token, ADMISSION_STATS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    return admission.stats()
+
 @app.post("/chat2", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     if not request.message:
         raise HTTPException(status_code=400, detail="Message is required")
     if not request.key:
         raise HTTPException(status_code=400, detail="S3 key is required")
 
+    # ---------- Admission Control ----------
+    # Fairness is per session within a client address; new conversations have
+    # no session yet, so fall back to the uploaded document
+    session = request.session_id or request.key
+    async with admission.slot(client_ip(http_request), session) as ticket:
+        try:
+            return await run_in_threadpool(run_chat_pipeline, request)
+        except HTTPException as e:
+            # Validation exits (missing or unreadable PDF) say nothing about pipeline cost
+            ticket.skip_sample = e.status_code < 500
+            raise
+
+def run_chat_pipeline(request: ChatRequest):
+    """Run the blocking PDF + LLM pipeline for one chat request"""
     # ---------- Load PDF from S3 ----------
     s3 = boto3.client(
         "s3",
@@ -487,7 +546,6 @@ async def chat(request: ChatRequest):
     conversation.append({"role": "user", "content": request.message})
     conversation.append({"role": "assistant", "content": final_answer})
     save_conversation(session_id, conversation)
-
     return ChatResponse(
         response=final_answer,
         session_id=session_id
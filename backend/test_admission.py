@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    """Let queued tasks run up to their next await."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def assert_idle(ac: AdmissionController):
+    stats = ac.stats()
+    assert stats["active"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["clients_in_flight"] == 0
+    assert stats["sessions_in_flight"] == 0
+
+
+def test_round_robin_across_sessions_behind_one_ip():
+    async def main():
+        ac = AdmissionController(max_concurrent=1, max_per_session=10, initial_service_time=0.01)
+        order = []
+
+        async def job(session, i):
+            async with ac.slot("campus", session):
+                order.append((session, i))
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(job("a", i)) for i in range(4)]
+        await settle()
+        tasks += [asyncio.create_task(job("b", i)) for i in range(2)]
+        await asyncio.gather(*tasks)
+        return ac, order
+
+    ac, order = run(main())
+    assert order == [("a", 0), ("a", 1), ("b", 0), ("a", 2), ("b", 1), ("a", 3)]
+    assert ac.stats()["admitted"] == 6
+    assert_idle(ac)
+
+
+def test_shared_ip_is_not_capped_by_default():
+    async def main():
+        ac = AdmissionController(max_concurrent=8)
+        for i in range(5):
+            await ac.acquire("campus", f"student{i}")
+        return ac
+
+    ac = run(main())
+    assert ac.stats()["active"] == 5
+    assert ac.stats()["rejected"]["client_limit"] == 0
+    assert ac.in_flight("campus") == 5
+
+
+def test_client_and_session_limits_return_429():
+    async def main():
+        ac = AdmissionController(max_per_client=3, max_per_session=2, initial_service_time=7)
+        await ac.acquire("ip", "s1")
+        await ac.acquire("ip", "s1")
+        with pytest.raises(AdmissionRejected) as session_exc:
+            await ac.acquire("ip", "s1")
+        await ac.acquire("ip", "s2")
+        with pytest.raises(AdmissionRejected) as client_exc:
+            await ac.acquire("ip", "s3")
+        return ac, session_exc.value, client_exc.value
+
+    ac, session_exc, client_exc = run(main())
+    assert (session_exc.status_code, session_exc.retry_after) == (429, 7)
+    assert (client_exc.status_code, client_exc.retry_after) == (429, 7)
+    assert ac.stats()["rejected"]["session_limit"] == 1
+    assert ac.stats()["rejected"]["client_limit"] == 1
+    assert ac.in_flight("ip") == 3
+    assert ac.in_flight("ip", "s1") == 2
+
+
+def test_default_limits_fill_queue_before_rejecting():
+    async def main():
+        ac = AdmissionController()
+        waiters = [asyncio.create_task(ac.acquire(f"ip{i}", "s")) for i in range(20)]
+        await settle()
+        stats = ac.stats()
+        for task in waiters:
+            task.cancel()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return ac, stats, results
+
+    ac, stats, results = run(main())
+    rejected = [r for r in results if isinstance(r, AdmissionRejected)]
+    assert stats["active"] == 4
+    assert stats["queue_depth"] == 8
+    assert len(rejected) == 8
+    assert all(r.status_code == 503 for r in rejected)
+    assert ac.stats()["rejected"]["queue_full"] == 8
+
+
+def test_deadline_rejects_with_estimated_retry_after():
+    async def main():
+        ac = AdmissionController(max_concurrent=1, max_wait=10, initial_service_time=8)
+        await ac.acquire("a", "s")
+        queued = asyncio.create_task(ac.acquire("b", "s"))
+        await settle()
+        with pytest.raises(AdmissionRejected) as exc:
+            await ac.acquire("c", "s")
+        queued.cancel()
+        return ac, exc.value
+
+    ac, exc = run(main())
+    # Next slot frees in ~8s, plus one full service time for "b" ahead
+    assert exc.status_code == 503
+    assert exc.retry_after == 16
+    assert ac.stats()["rejected"]["deadline"] == 1
+
+
+def test_timeout_while_queued_cleans_up():
+    async def main():
+        ac = AdmissionController(max_concurrent=1, max_wait=0.05, initial_service_time=0.01)
+        held = await ac.acquire("a", "s")
+        with pytest.raises(AdmissionRejected) as exc:
+            await ac.acquire("b", "s")
+        ac.release(held)
+        return ac, exc.value
+
+    ac, exc = run(main())
+    assert exc.status_code == 503
+    assert exc.retry_after >= 1
+    assert ac.stats()["rejected"]["timeout"] == 1
+    assert_idle(ac)
+
+
+def test_cancel_while_queued_cleans_up():
+    async def main():
+        ac = AdmissionController(max_concurrent=1)
+        held = await ac.acquire("a", "s")
+        queued = asyncio.create_task(ac.acquire("b", "s"))
+        await settle()
+        assert ac.stats()["queue_depth"] == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert ac.in_flight("a") == 1
+        assert ac.in_flight("b") == 0
+        ac.release(held)
+        return ac
+
+    assert_idle(run(main()))
+
+
+def test_cancel_after_grant_releases_slot():
+    async def main():
+        ac = AdmissionController(max_concurrent=1)
+        held = await ac.acquire("a", "s")
+        queued = asyncio.create_task(ac.acquire("b", "s"))
+        await settle()
+        # Grant the slot, then cancel before the waiter resumes
+        ac.release(held)
+        assert ac.stats()["active"] == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        return ac
+
+    assert_idle(run(main()))
+
+
+def test_quick_exits_do_not_update_service_time():
+    async def main():
+        ac = AdmissionController(initial_service_time=20)
+        async with ac.slot("a", "s") as ticket:
+            ticket.skip_sample = True
+        return ac
+
+    ac = run(main())
+    assert ac.stats()["est_service_seconds"] == 20
+    assert_idle(ac)
+
+
+def test_failed_and_slow_runs_update_service_time():
+    async def main():
+        ac = AdmissionController(initial_service_time=0.01)
+        async with ac.slot("a", "s") as ticket:
+            # Flagged as a quick exit but slower than the estimate, so it still counts
+            ticket.skip_sample = True
+            await asyncio.sleep(0.05)
+        slow = ac.stats()["est_service_seconds"]
+        with pytest.raises(RuntimeError):
+            async with ac.slot("a", "s"):
+                raise RuntimeError("LLM timed out")
+        return ac, slow
+
+    ac, slow = run(main())
+    assert slow > 0.01
+    assert ac.stats()["est_service_seconds"] < slow
+    assert_idle(ac)
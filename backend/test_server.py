@@ -0,0 +1,126 @@
+import asyncio
+import os
+
+# server.py builds its API clients and storage at import time
+os.environ.setdefault("google_api_key", "test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ["USE_S3"] = "false"
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import server
+from admission import AdmissionController
+
+BODY = {"message": "Summarise the lecture", "session_id": "s1", "key": "lecture.pdf"}
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app, raise_server_exceptions=False)
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    ac = AdmissionController(initial_service_time=7)
+    monkeypatch.setattr(server, "admission", ac)
+    return ac
+
+
+def make_request(forwarded=None, host="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234)})
+
+
+# ---------- client_ip ----------
+def test_client_ip_ignores_spoofed_forwarded_entries(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    assert server.client_ip(make_request("6.6.6.6, 203.0.113.5")) == "203.0.113.5"
+
+
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    assert server.client_ip(make_request("6.6.6.6, 203.0.113.5, 10.1.1.1")) == "203.0.113.5"
+
+
+def test_client_ip_falls_back_to_socket_address(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+    # Too few entries to have come through every trusted proxy
+    assert server.client_ip(make_request("6.6.6.6")) == "10.0.0.1"
+    assert server.client_ip(make_request()) == "10.0.0.1"
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+    assert server.client_ip(make_request("6.6.6.6")) == "10.0.0.1"
+
+
+# ---------- /chat2 admission ----------
+def test_validation_runs_before_admission(client, monkeypatch):
+    monkeypatch.setattr(server, "admission", AdmissionController(max_per_session=0))
+    assert client.post("/chat2", json={"key": "lecture.pdf"}).status_code == 400
+    assert client.post("/chat2", json={"message": "hi"}).status_code == 400
+
+
+def test_session_limit_returns_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(
+        server, "admission", AdmissionController(max_per_session=0, initial_service_time=7)
+    )
+    response = client.post("/chat2", json=BODY, headers={"Origin": "http://localhost:3000"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert "Retry-After" in response.headers["access-control-expose-headers"]
+
+
+def test_full_queue_returns_503_with_retry_after(client, monkeypatch):
+    ac = AdmissionController(max_concurrent=1, max_queue=0, initial_service_time=7)
+    asyncio.run(ac.acquire("other", "s"))
+    monkeypatch.setattr(server, "admission", ac)
+    response = client.post("/chat2", json=BODY)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_successful_run_releases_slot(client, admission, monkeypatch):
+    monkeypatch.setattr(
+        server, "run_chat_pipeline",
+        lambda request: server.ChatResponse(response="ok", session_id=request.session_id),
+    )
+    response = client.post("/chat2", json=BODY)
+    assert response.json() == {"response": "ok", "session_id": "s1"}
+    assert admission.stats()["active"] == 0
+    assert admission.stats()["est_service_seconds"] < 7
+
+
+def test_validation_exit_does_not_update_service_time(client, admission, monkeypatch):
+    def missing_pdf(request):
+        raise HTTPException(status_code=404, detail="PDF not found in S3")
+
+    monkeypatch.setattr(server, "run_chat_pipeline", missing_pdf)
+    assert client.post("/chat2", json=BODY).status_code == 404
+    assert admission.stats()["est_service_seconds"] == 7
+    assert admission.stats()["active"] == 0
+
+
+def test_pipeline_failure_updates_service_time(client, admission, monkeypatch):
+    def llm_down(request):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(server, "run_chat_pipeline", llm_down)
+    assert client.post("/chat2", json=BODY).status_code == 500
+    assert admission.stats()["est_service_seconds"] < 7
+    assert admission.stats()["active"] == 0
+
+
+# ---------- /admission/stats ----------
+def test_stats_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_STATS_TOKEN", None)
+    assert client.get("/admission/stats", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_stats_requires_matching_token(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMISSION_STATS_TOKEN", "secret")
+    assert client.get("/admission/stats").status_code == 401
+    assert client.get("/admission/stats", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    response = client.get("/admission/stats", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "queue_depth" in response.json()
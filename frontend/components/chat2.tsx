@@ -38,6 +38,16 @@ const ACTION_OPTIONS: ActionOption[] = [
 // const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://0.0.0.0:8000';
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'https://fatvzmpim2.eu-west-1.awsapprunner.com';
 
+// Admission control rejects with 429/503 and a Retry-After header when the server is overloaded
+const busyMessage = (response: Response): string | null => {
+    if (response.status !== 429 && response.status !== 503) return null;
+    const retryAfter = Number(response.headers.get('Retry-After'));
+    const when = Number.isFinite(retryAfter) && retryAfter > 0 ? `in about ${retryAfter}s` : 'shortly';
+    return response.status === 429
+        ? `You already have questions in progress. Please wait for them and try again ${when}.`
+        : `The assistant is busy right now. Please try again ${when}.`;
+};
+
 export default function Chat() {
     // State
     const [messages, setMessages] = useState<Message[]>([]);
@@ -147,6 +157,12 @@ export default function Chat() {
                 }),
             });
 
+            const busy = busyMessage(response);
+            if (busy) {
+                addMessage('assistant', busy);
+                return;
+            }
+
             if (!response.ok) throw new Error('Failed to generate content');
 
             const data = await response.json();
@@ -184,6 +200,12 @@ export default function Chat() {
                 }),
             });
 
+            const busy = busyMessage(response);
+            if (busy) {
+                addMessage('assistant', busy);
+                return;
+            }
+
             if (!response.ok) throw new Error('Failed to send message');
 
             const data = await response.json();